@@ -15,15 +15,14 @@ def on_character(
 	"a"	, "foo"
 	"biff" , "gromulon"
 	"""
+	lines = list(lines)
 	if not lines:
 		return ""
-	max_first = max(len(l[0]) for l in lines)
+	firsts, seconds = zip(*lines)
+	max_first = max(map(len, firsts))
+	tail = tail or ""
 	results = [
-		"{{first: <{}}}{{separator}}{{second}}{{tail}}".format(max_first).format(
-			first=first,
-			second=second,
-			separator=separator,
-			tail=tail if tail else "",
-		) for first, second in lines]
+		f"{first.ljust(max_first)}{separator}{second}{tail}"
+		for first, second in zip(firsts, seconds)]
 	return joiner.join(results)
 
@@ -3,6 +3,15 @@ import logging
 from pyfmt import constants
 from typed_ast import ast3
 
+# The types of values that make an assignment a constant
+CONSTANT_TYPES = frozenset((ast3.NameConstant, ast3.Num, ast3.Str))
+# The types of values that make an assignment a declaration
+DECLARATION_TYPES = CONSTANT_TYPES | {ast3.Call}
+# The number of blank lines to put after each type of statement
+BLANKLINES = {
+	ast3.ClassDef: 1,
+	ast3.FunctionDef: 1,
+}
 
 def format(body, context, do_indent=True):
 	"""Format a body like a function or module body.
@@ -11,69 +20,69 @@ def format(body, context, do_indent=True):
 	of sorting certain orderable statements within those
 	sections, like imports.
 	"""
-	doc, remainder = _split_docstring(body)
-	stdimports, imports, remainder = _split_imports(remainder)
-	constants, remainder = _split_constants(remainder)
-	declarations, remainder = _split_declarations(remainder)
+	doc, stdimports, imports, constants, declarations, remainder = _split_sections(body)
 
 	constants = _format_constants(constants, context)
 	declarations = _format_declarations(declarations, context)
 	docstring = _format_docstring(doc, context)
 	stdimports = _format_imports(stdimports, context)
 	imports = _format_imports(imports, context)
-	content = _format_content(remainder, context)
-	for section in (constants, declarations, stdimports, imports):
+
+	# Collect every line into a single list so the body is joined
+	# exactly once, with a blank line after each non-empty section.
+	lines = list(docstring)
+	for section in (stdimports, imports, constants, declarations):
 		if section:
-			section.append("")
+			lines.extend(section)
+			lines.append("")
+	_format_content(remainder, context, lines)
 
 	# There may be comments in the body that were not extracted
 	# in _format_content because it was empty. Find any of those
 	# comments and add them to the body now
-	comments = []
-	for node in body[::-1]:
-		if hasattr(node, "lineno"):
+	for node in reversed(body):
+		lineno = getattr(node, "lineno", None)
+		if lineno is not None:
 			# We need to capture any comments that are at the end of this block of
 			# code. In order to do that we take whatever the highest line number
 			# is and we get the comments for an imaginary line of code that is
 			# beyond wherever the comment would be (+2).
-			comments = context.get_standalone_comments(node.lineno+2, node.col_offset, allow_dedent=False)
+			comments = context.get_standalone_comments(lineno+2, node.col_offset, allow_dedent=False)
+			lines.extend(comment.content for comment in comments)
 			break
-			
-	body = [l for section in (docstring, stdimports, imports, constants, declarations, content) for l in section]
-	body += [comment.content for comment in comments]
 	if do_indent:
-		body = context.add_indent(body)
-	return "\n".join(body)
+		tab = context.tab
+		return "\n".join(tab + line if line else "" for line in lines)
+	return "\n".join(lines)
    
 def _format_constants(constants, context):
-	return sorted([context.format_value(c, context) for c in constants])
+	lines = [context.format_value(c, context) for c in constants]
+	lines.sort()
+	return lines
 
-def _format_content(section, context) -> list:
-	"""Convert a tree of content into a list of lines to be indented and joined."""
+def _format_content(section, context, lines) -> None:
+	"""Convert a tree of content into lines, appending them to lines."""
 	if not section:
-		return []
+		return
 
-	BLANKLINES = {
-		ast3.ClassDef: 1,
-		ast3.FunctionDef: 1,
-	}
-	lines = []
 	for node in section:
-		if hasattr(node, 'lineno'):
-			pre_comments = context.get_standalone_comments(node.lineno, node.col_offset)
-			logging.debug("Found %d pre-comments for %s content at %d", len(pre_comments), type(node), node.lineno)
-			lines += [comment.content for comment in pre_comments]
-			inline_comment = context.get_inline_comment(node.lineno).content
-			inline_comment = " " + inline_comment if inline_comment else ""
+		lineno = getattr(node, "lineno", None)
+		if lineno is not None:
+			pre_comments = context.get_standalone_comments(lineno, node.col_offset)
+			if context.debug:
+				logging.debug("Found %d pre-comments for %s content at %d", len(pre_comments), type(node), lineno)
+			lines.extend(comment.content for comment in pre_comments)
+			inline_comment = context.get_inline_comment(lineno).content
 		else:
 			inline_comment = ""
 		content = context.format_value(node, context)
 		content_lines = content.split("\n")
-		content_lines[0] = content_lines[0] + inline_comment
-		lines += content_lines
+		if inline_comment:
+			content_lines[0] += " " + inline_comment
+		lines.extend(content_lines)
 		blanks = BLANKLINES.get(type(node), 0)
-		lines += ([""] * blanks)
-	return lines
+		if blanks:
+			lines.extend([""] * blanks)
 
 def _format_declarations(declarations, context):
 	return [context.format_value(d, context) for d in declarations]
@@ -90,84 +99,124 @@ def _format_docstring(value, context) -> list:
 	if not value:
 		return []
 	subvalue = value.value
+	quote = context.quote
 	if "\n" in subvalue.s:
-		content = (context.quote * 3) + subvalue.s + (context.quote * 3)
-		lines = content.split("\n")
+		quotes = quote * 3
+		lines = (quotes + subvalue.s + quotes).split("\n")
 	else:
-		lines = [context.quote + subvalue.s + context.quote]
-	clean_lines = [line.strip() if line else "" for line in lines]
-	return clean_lines
+		lines = [quote + subvalue.s + quote]
+	return [line.strip() for line in lines]
 
 def _format_imports(imports, context) -> list:
-	lines = [context.format_value(i, context) for i in imports]
-	return sorted(lines)
-
-def _split_constants(remainder):
-	"Given the remainder of a body return the constants and whatever else is left."
-	constants = []
-	while remainder and isinstance(remainder[0], ast3.Assign):
-		node = remainder[0]
+	"""Sort (module, name) pairs from _split_imports in place and format them into lines.
+
+	The module is None for a plain 'import name'.
+	"""
+	imports.sort(key=_import_sort_key)
+	return [
+		"import " + name if module is None else f"from {module} import {name}"
+		for module, name in imports]
+
+def _import_sort_key(import_):
+	"""Get a key that sorts (module, name) pairs the way their lines would sort.
+
+	Comparing the short module and name strings is cheaper than comparing
+	the rendered lines. 'from' sorts before 'import', so the pairs with a
+	module go first.
+	"""
+	module, name = import_
+	return (module is None, module or "", name)
+
+def _split_constants(body, start):
+	"Given a body and where its constants may start return the constants and where they end."
+	i = start
+	while i < len(body) and type(body[i]) is ast3.Assign:
+		node = body[i]
 		if len(node.targets) > 1:
 			break;
-		if not isinstance(node.targets[0], ast3.Name):
+		if type(node.targets[0]) is not ast3.Name:
 			break;
-		if type(node.value) not in (ast3.NameConstant, ast3.Str, ast3.Num):
+		if type(node.value) not in CONSTANT_TYPES:
 			break;
-		constants.append(remainder.pop(0))
+		i += 1
+	constants = body[start:i]
 	logging.debug("Found %d constant lines", len(constants))
-	return constants, remainder
+	return constants, i
 
-def _split_declarations(remainder):
-	"Given the remainder of a body return the declarations and whatever else is left."
-	declarations = []
-	while remainder and isinstance(remainder[0], ast3.Assign):
-		node = remainder[0]
+def _split_declarations(body, start):
+	"Given a body and where its declarations may start return the declarations and where they end."
+	i = start
+	while i < len(body) and type(body[i]) is ast3.Assign:
+		node = body[i]
 		if len(node.targets) > 1:
 			break;
-		if not isinstance(node.targets[0], ast3.Name):
+		if type(node.targets[0]) is not ast3.Name:
 			break;
-		if type(node.value) not in (
-			ast3.Call,
-			ast3.NameConstant,
-			ast3.Num,
-			ast3.Str):
+		if type(node.value) not in DECLARATION_TYPES:
 			break;
-		declarations.append(remainder.pop(0))
+		i += 1
+	declarations = body[start:i]
 	logging.debug("Found %d declaration lines", len(declarations))
-	return declarations, remainder
-
-def _split_docstring(remainder):
-	"""Given the non-import sections of a body, return the docstring and remainder."""
-	if not (remainder and isinstance(remainder[0], ast3.Expr) and isinstance(remainder[0].value, ast3.Str)):
-		return [], remainder
-	return remainder[0], remainder[1:]
-
-def _split_imports(body):
-	"""Given a body reurn the import statemens and remaining statements."""
+	return declarations, i
+
+def _split_docstring(body):
+	"""Given a body, return the docstring and the index of the statement after it."""
+	if not (body and type(body[0]) is ast3.Expr and type(body[0].value) is ast3.Str):
+		return [], 0
+	return body[0], 1
+
+def _alias_name(alias):
+	"""Get an imported name as written, like 'numpy' or 'numpy as np'."""
+	if alias.asname is None:
+		return alias.name
+	return f"{alias.name} as {alias.asname}"
+
+def _split_imports(body, start):
+	"""Given a body reurn the import statemens from start and the index after them.
+
+	Each import is split into one (module, name) pair per imported
+	name so that they can be sorted one per line. The module is None
+	for a plain 'import name', and the name includes any 'as' alias.
+	"""
 	imports	= []
-	remainder  = []
 	stdimports = []
-	in_imports = True
-	for line in body:
-		if in_imports:
-			if isinstance(line, ast3.Import):
-				for alias in line.names:
-					if alias.name in constants.STANDARD_PYTHON_MODULES:
-						stdimports.append(ast3.Import(names=[alias]))
-					else:
-						imports.append(ast3.Import(names=[alias]))
-			elif isinstance(line, ast3.ImportFrom):
-				new_imports = [ast3.ImportFrom(
-					module=line.module,
-					names=[name],
-				) for name in line.names]
-				if line.module in constants.STANDARD_PYTHON_MODULES:
-					stdimports += new_imports
+	std_modules = constants.STANDARD_PYTHON_MODULES
+	# Stop at the first statement that isn't an import.
+	# AST node classes are never subclassed so an identity check on the
+	# exact type is enough and cheaper than isinstance.
+	for i in range(start, len(body)):
+		line = body[i]
+		type_ = type(line)
+		if type_ is ast3.Import:
+			for alias in line.names:
+				if alias.name.partition(".")[0] in std_modules:
+					stdimports.append((None, _alias_name(alias)))
 				else:
-					imports += new_imports
+					imports.append((None, _alias_name(alias)))
+		elif type_ is ast3.ImportFrom:
+			module = ("." * (line.level or 0)) + (line.module or "")
+			new_imports = [(module, _alias_name(alias)) for alias in line.names]
+			# Relative imports are always from the current package, and
+			# submodules like os.path belong with their top-level package.
+			if not line.level and line.module.partition(".")[0] in std_modules:
+				stdimports += new_imports
 			else:
-				in_imports = False
-		if not in_imports:
-			remainder.append(line)
-	return stdimports, imports, remainder
+				imports += new_imports
+		else:
+			break
+	else:
+		i = len(body)
+	return stdimports, imports, i
+
+def _split_sections(body):
+	"""Split a body into its docstring, imports, constants, declarations and whatever else is left.
+
+	Each section picks up where the last one ended so the body is
+	walked once and only sliced for the sections themselves.
+	"""
+	doc, i = _split_docstring(body)
+	stdimports, imports, i = _split_imports(body, i)
+	constants, i = _split_constants(body, i)
+	declarations, i = _split_declarations(body, i)
+	return doc, stdimports, imports, constants, declarations, body[i:]
 
@@ -1,4 +1,4 @@
-STANDARD_PYTHON_MODULES = (
+STANDARD_PYTHON_MODULES = frozenset((
     "__future__",
     "_bootlocale",
     "_collections_abc",
@@ -199,4 +199,4 @@ STANDARD_PYTHON_MODULES = (
     "xmlrpc",
     "zipapp",
     "zipfile",
-)
+))
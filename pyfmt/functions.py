@@ -1,7 +1,8 @@
 import collections
+import operator
 import typing
 
-from pyfmt import alignment, body, decorators, errors
+from pyfmt import body, decorators, errors
 from typed_ast import ast3
 
 Arguments = collections.namedtuple("Arguments", ("arguments", "karguments", "kwargs", "vargs"))
@@ -35,25 +36,30 @@ def format_lambda(lambda_, context):
 	prefix = len("lambda ")
 	args = context.format_value(lambda_.args, context.reserve(prefix))
 	body_ = context.format_value(lambda_.body, context=context.reserve(prefix + len(args)))
-	possible = "lambda {args}: {body}".format(
-		args = args,
-		body = body_,
-	)
+	possible = f"lambda {args}: {body_}"
 	lines = possible.split("\n")
-	if all([len(l) <= context.remaining_line_length for l in lines]):
+	remaining = context.remaining_line_length
+	if all(len(l) <= remaining for l in lines):
 		return possible
 	body_parts = body_.split("\n")
 	body_parts = context.add_indent(body_parts)
-	return "lambda {args}:\n{body}".format(
-		args = args,
-		body = "\n".join(body_parts),
-	)
+	body_ = "\n".join(body_parts)
+	return f"lambda {args}:\n{body_}"
 
-def _align_kwargs(kwargs: typing.Iterable[Arguments]) -> typing.Iterable[typing.Text]:
-	"""Given an iterable of kwargs line them up and return them."""
-	parts = [(kwarg.name, kwarg.default) for kwarg in kwargs]
-	parts = sorted(parts, key=lambda x: x[0])
-	return alignment.on_character(parts, " = ")
+def _align_kwargs(kwargs: typing.Iterable[Arguments]) -> typing.List[typing.Text]:
+	"""Given an iterable of kwargs line them up and return them as lines.
+
+	Those with a default are lined up on their ' = ', those without
+	one are left as just the name.
+	"""
+	kwargs = sorted(kwargs, key=operator.attrgetter("name"))
+	names = [
+		kwarg.name + (": " + kwarg.annotation if kwarg.annotation else "")
+		for kwarg in kwargs]
+	pad = max((len(name) for name, kwarg in zip(names, kwargs) if kwarg.default is not None), default=0)
+	return [
+		name if kwarg.default is None else name.ljust(pad) + " = " + kwarg.default
+		for name, kwarg in zip(names, kwargs)]
 
 def _collate_arguments(value, context) -> typing.Iterable[Arguments]:
 	"""Given the arguments turn them into an easier structure.
@@ -77,24 +83,20 @@ def _collate_arguments(value, context) -> typing.Iterable[Arguments]:
 	for i, kwarg in enumerate(value.kwonlyargs):
 		default = value.kw_defaults[i]
 		results.append(Argument(
-			annotation = context.format_value(kwarg.annotation) if kwarg.annotation else None,
-			default	   = context.format_value(default, context),
+			annotation = context.format_value(kwarg.annotation, context) if kwarg.annotation else None,
+			default	   = context.format_value(default, context) if default else None,
 			name	   = kwarg.arg,
 		))
 	return results
 
 def _format_arg(arg, context):
-	return "{arg}{annotation}{default}".format(
-		annotation = (": " + arg.annotation) if arg.annotation else "",
-		arg = arg.name,
-		default = ("=" + arg.default) if arg.default else "",
-	)
+	annotation = (": " + arg.annotation) if arg.annotation else ""
+	default = ("=" + arg.default) if arg.default else ""
+	return f"{arg.name}{annotation}{default}"
 
 def _format_arguments_horizontally(value, context, args):
-	args = _collate_arguments(value, context)
 	parts = [_format_arg(arg, context) for arg in args[:len(value.args)]]
-	if value.vararg:
-		parts.append("*" + value.vararg.arg)
+	parts.extend(_format_vararg(value))
 	parts += [_format_arg(kwarg, context) for kwarg in args[len(value.args):]]
 	if value.kwarg:
 		parts.append("**" + value.kwarg.arg)
@@ -105,24 +107,26 @@ def _format_arguments_horizontally(value, context, args):
 
 def _format_arguments_vertically(value, context, args):
 	parts = [_format_arg(arg, context) for arg in args[:len(value.args)]]
-	if value.vararg:
-		parts.append("*" + value.vararg.arg)
-	parts += _align_kwargs(args[len(value.args):])
+	parts.extend(_format_vararg(value))
+	parts.extend(_align_kwargs(args[len(value.args):]))
 	if value.kwarg:
 		parts.append("**" + value.kwarg.arg)
 	return "\n\t" + (",\n\t".join(parts))
 
+def _format_vararg(value):
+	"""Get the '*args' part of the arguments, or a bare '*' if only keyword-only arguments follow."""
+	if value.vararg:
+		return ["*" + value.vararg.arg]
+	if value.kwonlyargs:
+		return ["*"]
+	return []
+
 def _format_function_def(prefix, func, context):
 	decorators_ = decorators.format(func.decorator_list, context)
-	def_ = "{} {}".format(prefix, func.name)
+	def_ = prefix + " " + func.name
 	arguments = context.format_value(func.args, context.reserve(len(def_)))
-	with context.sub() as sub:
+	with context.sub():
 		body_ = body.format(func.body, context=context)
-	return "{decorators}{def_}({arguments}){returns}:\n{body}".format(
-		arguments=arguments,
-		body=body_,
-		decorators=decorators_,
-		def_=def_,
-		returns=" -> " + context.format_value(func.returns, context) if func.returns else "",
-	)
+	returns = " -> " + context.format_value(func.returns, context) if func.returns else ""
+	return "".join([decorators_, def_, "(", arguments, ")", returns, ":\n", body_])
 
@@ -26,17 +26,11 @@ def _format_direct(value: typing.Text, context: types.Context):
     if len(value) > context.remaining_line_length:
         raise StrategyFailureError("Value length is {} which is longer than context max line length of {}".format(len(value), context.remaining_line_length))
     result = value.replace("\t", r"\t").replace("\n", r"\n")
-    return "{quote}{result}{quote}".format(
-        quote=context.quote,
-        result=result,
-    )
+    return context.quote + result + context.quote
 
 def _make_string_line(line: typing.Iterable[typing.Text], context:types.Context) -> typing.Text:
-    return "{tabs}{quote}{content}{quote}".format(
-        content="".join(line),
-        quote=context.quote,
-        tabs=(context.indent + 1) * context.tab,
-    )
+    tabs = (context.indent + 1) * context.tab
+    return f"{tabs}{context.quote}{''.join(line)}{context.quote}"
 
 def _format_spaces(value: typing.Text, context: types.Context):
     "The string is long, try to break it on spaces. And newlines."
@@ -45,12 +39,24 @@ def _format_spaces(value: typing.Text, context: types.Context):
     words = value.split(" ")
     for i in range(len(words) - 1):
         words[i] = words[i] + " "
+    # Keep the words as a stack with the next word on the end
+    # so taking and pushing back words doesn't shift the list.
+    words.reverse()
+    # The length a line has before any words are added to it, which
+    # is its indentation and the quotes on either end.
+    overhead = len(_make_string_line([], context))
+    # The most characters of words that fit on a line.
+    room = context.max_line_length - overhead
+    # Finished lines are all indented the same amount, so
+    # build the context for them once rather than per line.
+    line_context = context.override(indent=0)
     # For each word see if we can make a line. Once it's
     # too long we step back and add the line to our results.
     results = []
     line = []
+    line_length = 0
     while words:
-        word = words.pop(0)
+        word = words.pop()
         # If the line has a newline then gather all the newlines
         # together into a single line and break there.
         newlines_start = word.find("\n")
@@ -62,28 +68,26 @@ def _format_spaces(value: typing.Text, context: types.Context):
             # be added back to our stack for processing.
             remainder = word[newlines_end:]
             if remainder:
-                words.insert(0, remainder)
+                words.append(remainder)
             word = word[:newlines_end]
             word = word.replace("\n", r"\n")
-            results.append(_make_string_line(line + [word], context.override(indent=0)))
+            line.append(word)
+            results.append(_make_string_line(line, line_context))
             line = []
+            line_length = 0
             continue
-        possible_line = line + [word]
-        test_line = _make_string_line(possible_line, context)
-        if len(test_line) < context.max_line_length:
-            line = possible_line
+        if line_length + len(word) < room:
+            line.append(word)
+            line_length += len(word)
             continue
-        results.append(_make_string_line(line, context.override(indent=0)))
+        results.append(_make_string_line(line, line_context))
         line = []
-        words.insert(0, word)
+        line_length = 0
+        words.append(word)
     if line:
-        results.append(_make_string_line(line, context.override(indent=0)))
+        results.append(_make_string_line(line, line_context))
     content = "\n".join(results)
     return "(\n" + content + "\n)"
-    return "{quote}{result}{quote}".format(
-        quote=context.quote,
-        result=result,
-    )
 
 # The strategies we prefer, in order, for breaking up a
 # large string.
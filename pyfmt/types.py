@@ -1,9 +1,22 @@
+import bisect
 import collections
-import contextlib
 import logging
 import typing
 
 Comment = collections.namedtuple("Comment", ("srow", "scolumn", "content", "dedent"))
+# Returned when a line has no comment we can use
+EMPTY_COMMENT = Comment(None, None, "", False)
+
+# The parameters of a Context that Context.override can change
+OVERRIDABLE = frozenset((
+	"indent",
+	"inline",
+	"max_line_length",
+	"quote",
+	"reserved_space",
+	"suppress_tuple_parens",
+	"tab",
+))
 
 class Context():
 	"""Represents the context of the operation being serialized.
@@ -11,9 +24,30 @@ class Context():
 	This class is used heavily in making decisions about the application
 	of whitespace.
 	"""
-	def __init__(self, format_value, comments=None, indent=0, inline=False, max_line_length=120, quote="'", reserved_space=0, suppress_tuple_parens=False, tab='\t'):
-		self.comments = comments or []
+	__slots__ = (
+		"_comments_read_index",
+		"comment_lines",
+		"comments",
+		"debug",
+		"format_value",
+		"indent",
+		"inline",
+		"max_line_length",
+		"quote",
+		"reserved_space",
+		"suppress_tuple_parens",
+		"tab",
+	)
+
+	def __init__(self, format_value, comments=None, debug=False, indent=0, inline=False, max_line_length=120, quote="'", reserved_space=0, suppress_tuple_parens=False, tab='\t'):
+		self.comments = comments or {}
+		# The sorted line numbers that have a comment, so we can jump
+		# between them instead of walking every line.
+		self.comment_lines = sorted(self.comments)
 		self._comments_read_index = 0
+		# Whether debug logging is on, checked once up front so the
+		# comment lookups don't build log records for nothing.
+		self.debug = debug
 		self.format_value = format_value
 		self.indent = indent
 		self.inline = inline
@@ -57,14 +91,13 @@ class Context():
 
 	def get_inline_comment(self, lineno):
 		"""Get comment in the provided line."""
-		empty_comment = Comment(None, None, "", False)
 		if lineno < self._comments_read_index:
-			return empty_comment
-		result = self.comments[lineno]
+			return EMPTY_COMMENT
+		result = self.comments.get(lineno)
 		if result and result.dedent:
-			return empty_comment
+			return EMPTY_COMMENT
 		self._comments_read_index += 1
-		return result or empty_comment
+		return result or EMPTY_COMMENT
 
 	def get_standalone_comments(self, lineno, col_offset, allow_dedent=True) -> list:
 		"""Get comments in lines before providedlines.
@@ -74,15 +107,21 @@ class Context():
 		"""
 		results = []
 		start = self._comments_read_index
-		while self._comments_read_index < len(self.comments) and self._comments_read_index < lineno:
-			comment = self.comments[self._comments_read_index]
-			if comment:
-				if comment.dedent and not allow_dedent:
+		if start >= lineno:
+			return results
+		first = bisect.bisect_left(self.comment_lines, start)
+		last = bisect.bisect_left(self.comment_lines, lineno)
+		for i in range(first, last):
+			comment = self.comments[self.comment_lines[i]]
+			if comment.dedent and not allow_dedent:
+				if self.debug:
 					logging.debug("Refusing to provide comment for line %d because the comment we have is a dedent comment", lineno)
-					break
-				results.append(comment)
-			self._comments_read_index += 1
-		if start != self._comments_read_index:
+				self._comments_read_index = comment.srow
+				break
+			results.append(comment)
+		else:
+			self._comments_read_index = lineno
+		if self.debug and start != self._comments_read_index:
 			logging.debug("Advanced comments read index to %d", self._comments_read_index)
 		return results
 
@@ -93,10 +132,17 @@ class Context():
 		B that is identical to A but has a different quote delimitre you would
 		use A.override(quote="foo")
 		"""
-		VALID_PARAMS = ("indent", "inline", "max_line_length", "quote", "reserved_space", "suppress_tuple_parens", "tab")
-		assert all(k in VALID_PARAMS for k in kwargs.keys())
-		params = {k: kwargs.get(k, getattr(self, k)) for k in VALID_PARAMS}
-		return Context(format_value=self.format_value, **params)
+		assert kwargs.keys() <= OVERRIDABLE, "Can't override {}".format(kwargs.keys() - OVERRIDABLE)
+		return Context(
+			debug                 = self.debug,
+			format_value          = self.format_value,
+			indent                = kwargs.get("indent", self.indent),
+			inline                = kwargs.get("inline", self.inline),
+			max_line_length       = kwargs.get("max_line_length", self.max_line_length),
+			quote                 = kwargs.get("quote", self.quote),
+			reserved_space        = kwargs.get("reserved_space", self.reserved_space),
+			suppress_tuple_parens = kwargs.get("suppress_tuple_parens", self.suppress_tuple_parens),
+			tab                   = kwargs.get("tab", self.tab))
 
 	@property
 	def remaining_line_length(self) -> int:
@@ -123,16 +169,29 @@ class Context():
 		function has the smarts to look for newlines to reserve the
 		proper amount on the last line.
 		"""
-		try:
-			last_newline = text.rindex("\n")
-		except ValueError:
-			return self.reserve(len(text))
-		last_line = text[last_newline+1:]
-		return self.reserve(len(last_line))
-
-	@contextlib.contextmanager
+		# rfind gives -1 without a newline, which makes this the whole text.
+		return self.reserve(len(text) - text.rfind("\n") - 1)
+
 	def sub(self):
-		self.indent += 1
-		yield self
-		self.indent -= 1
+		"""Indent this context by one level for the duration of a with block."""
+		return _Sub(self)
+
+class _Sub():
+	"""The context manager returned by Context.sub.
+
+	This is a plain class rather than a contextlib.contextmanager
+	generator because it is entered for every block statement and
+	the generator machinery costs several times as much.
+	"""
+	__slots__ = ("context",)
+
+	def __init__(self, context):
+		self.context = context
+
+	def __enter__(self):
+		self.context.indent += 1
+		return self.context
+
+	def __exit__(self, *exc_info):
+		self.context.indent -= 1
 
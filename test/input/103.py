@@ -0,0 +1,3 @@
+from . import foo
+from ..bar import baz
+import os
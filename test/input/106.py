@@ -0,0 +1,3 @@
+x = (1,)
+for a, in b:
+    pass
@@ -0,0 +1 @@
+x = {"b": 1, "a": 2, "b": 3}
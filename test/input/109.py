@@ -0,0 +1,4 @@
+from os.path import join
+import xml.etree.ElementTree
+from .json import thing
+import requests
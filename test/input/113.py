@@ -0,0 +1,7 @@
+import numpy as np
+import os
+from collections import OrderedDict as odict
+
+print(np, os, odict)
+
+import json as j, re
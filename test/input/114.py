@@ -0,0 +1,6 @@
+from . import sibling
+
+print(sibling)
+
+from . import late
+from ..parent import thing, other
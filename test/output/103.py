@@ -0,0 +1,4 @@
+import os
+
+from . import foo
+from ..bar import baz
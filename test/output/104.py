@@ -0,0 +1 @@
+total = sum(cell for row in grid for cell in row)
@@ -0,0 +1,5 @@
+def f(*, a: int=1):
+	pass
+
+def g(x, *, y, z=2, **kwargs):
+	pass
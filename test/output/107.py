@@ -0,0 +1 @@
+x = {"a": 2, "b": 1, "b": 3}
@@ -0,0 +1,10 @@
+a = b // c
+d = e << 1 >> 2
+f = g ^ h
+i = ~j
+k = +l
+m = n not in o
+p = q is not r
+s = t @ u
+for v in w:
+	continue
@@ -0,0 +1,5 @@
+from os.path import join
+import xml.etree.ElementTree
+
+from .json import thing
+import requests
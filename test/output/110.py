@@ -0,0 +1,6 @@
+f(a, b=1, **kw)
+function_with_a_long_name(
+	first_positional_argument,
+	keyword_argument = some_value_here,
+	other            = 1,
+	**remaining_keyword_arguments)
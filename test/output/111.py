@@ -0,0 +1,8 @@
+def function_with_long_name(
+	first_argument,
+	second_argument,
+	*,
+	keyword_only_arg,
+	other_keyword_arg = "some_default_value_here",
+	typed: int        = 3):
+	pass
@@ -0,0 +1,4 @@
+value = (
+	"a single element that is long enough to push this line past the limit!!",
+	)
+short = (1,)
@@ -0,0 +1,7 @@
+from collections import OrderedDict as odict
+import os
+
+import numpy as np
+
+print(np, os, odict)
+import json as j, re
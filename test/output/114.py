@@ -0,0 +1,5 @@
+from . import sibling
+
+print(sibling)
+from . import late
+from ..parent import other, thing
@@ -32,3 +32,14 @@ def test_alignment_tail():
 		"a  : bar,\n"
 		"bif: baz,"
 	)
+
+def test_alignment_generator():
+	input_ = (pair for pair in [
+		("a", "bar"),
+		("bif", "baz"),
+	])
+	results = pyfmt.alignment.on_character(input_, " = ")
+	assert results == (
+		"a   = bar\n"
+		"bif = baz"
+	)